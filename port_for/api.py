@@ -3,7 +3,10 @@ from __future__ import absolute_import, division, with_statement
 import contextlib
 import socket
 import errno
+import functools
 import random
+import select
+from concurrent.futures import ThreadPoolExecutor
 from itertools import chain
 from port_for import ephemeral, utils
 from ._ranges import UNASSIGNED_RANGES
@@ -12,55 +15,153 @@ from .exceptions import PortForException
 
 SYSTEM_PORT_RANGE = (0, 1024)
 
+# Normalized once at import: an immutable, pre-sorted copy of the
+# generated ranges so every availability computation starts from the
+# same shared tuple instead of re-sorting the module-level list.
+_UNASSIGNED_RANGES = tuple(sorted(UNASSIGNED_RANGES))
+
+# Port probing is I/O bound (two socket syscalls per port), so checking
+# candidates in parallel cuts wall-clock time roughly by the pool width.
+# Keep the pool moderate: very high concurrency makes probe results
+# unreliable on some systems.
+_PROBE_POOL_SIZE = 128
+
+# How many ports to draw and test per sampling round, and how many
+# probes to spend on sampling before falling back to a full scan.
+_SAMPLE_BATCH_SIZE = 16
+_MAX_SAMPLED_PORTS = 256
+
+# Loopback connects settle in microseconds; this only bounds how long
+# a probe may wait for a non-blocking connect to resolve.
+_CONNECT_TIMEOUT = 0.2
+
 
 def select_random(ports=None, exclude_ports=None):
     """
     Returns random unused port number.
     """
     if ports is None:
+        # Draw candidates straight from the good ranges instead of
+        # materializing the ~20k-port set first; a weighted pick from
+        # a range is as uniform as sampling the expanded set.
+        ranges = good_port_ranges()
+        if ranges:
+            exclude = set(exclude_ports) if exclude_ports else ()
+            weights = [hi - lo + 1 for lo, hi in ranges]
+            for _ in range(0, _MAX_SAMPLED_PORTS, _SAMPLE_BATCH_SIZE):
+                picks = random.choices(ranges, weights, k=_SAMPLE_BATCH_SIZE)
+                for lo, hi in picks:
+                    port = random.randint(lo, hi)
+                    if port in exclude:
+                        continue
+                    if not port_is_used(port):
+                        return port
+        # Very unlucky: fall through to the materialized set and the
+        # exhaustive scan below.
         ports = available_good_ports()
 
-    if exclude_ports is None:
-        exclude_ports = set()
-
-    # Convert to set if not already
-    if not isinstance(ports, set):
-        ports = set(ports)
-
-    ports = ports.difference(set(exclude_ports))
-
-    # Filter out used ports
-    available = [port for port in ports if not port_is_used(port)]
-
-    if not available:
+    # Only pay for set conversion and difference when there is
+    # actually something to exclude (there usually isn't); a set
+    # passed by the caller is used as-is.
+    if exclude_ports:
+        if not isinstance(ports, (set, frozenset)):
+            ports = set(ports)
+        ports = ports.difference(set(exclude_ports))
+
+    # Sampling needs a sequence; reuse the caller's list/tuple instead
+    # of copying it (it is never mutated below).
+    if isinstance(ports, (list, tuple)):
+        port_list = ports
+    else:
+        port_list = list(ports)
+    if not port_list:
         raise PortForException("Can't select a port")
 
-    # Return a random available port
-    return random.choice(available)
+    # Unused ports vastly outnumber used ones, so testing a few random
+    # candidates almost always succeeds immediately; probing the whole
+    # candidate set up-front would be wasted syscalls.
+    sampled = 0
+    while sampled < _MAX_SAMPLED_PORTS:
+        batch = random.sample(
+            port_list, min(_SAMPLE_BATCH_SIZE, len(port_list))
+        )
+        for port in batch:
+            if not port_is_used(port):
+                return port
+        sampled += len(batch)
+        if len(port_list) <= _SAMPLE_BATCH_SIZE:
+            # The batch already covered every candidate.
+            break
+
+    # Unlucky (or a small/busy candidate set): fall back to probing
+    # everything in parallel (each port_is_used call builds its own
+    # sockets, so it is safe to run from multiple threads).
+    workers = min(_PROBE_POOL_SIZE, len(port_list))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        used = executor.map(port_is_used, port_list)
+
+    # Reservoir pick: keeping the n-th unused port with probability 1/n
+    # selects uniformly without collecting all unused ports in a list.
+    chosen = None
+    seen = 0
+    for port, is_used in zip(port_list, used):
+        if is_used:
+            continue
+        seen += 1
+        if random.randrange(seen) == 0:
+            chosen = port
+
+    if chosen is None:
+        raise PortForException("Can't select a port")
+    return chosen
 
 
 def is_available(port):
     """
     Returns if port is good to choose.
     """
-    return port in available_ports() and not port_is_used(port)
+    # Checking the port against the available ranges avoids ever
+    # materializing the full port set for a single membership test.
+    ranges = _available_port_ranges(1024, 65535, ())
+    in_range = any(lo <= port <= hi for lo, hi in ranges)
+    return in_range and not port_is_used(port)
 
 
 def available_ports(low=1024, high=65535, exclude_ranges=None):
     """
-    Returns a set of possible ports (excluding system,
+    Returns a frozenset of possible ports (excluding system,
     ephemeral and well-known ports).
     Pass ``high`` and/or ``low`` to limit the port range.
+
+    The result is cached for the process lifetime; call
+    ``available_ports.cache_clear()`` if the ephemeral port ranges may
+    have changed (this drops every cached availability computation,
+    including ``available_good_ports``).
     """
     if exclude_ranges is None:
         exclude_ranges = []
-    available = utils.ranges_to_set(UNASSIGNED_RANGES)
-    exclude = utils.ranges_to_set(
+    return _available_ports_cached(low, high, tuple(exclude_ranges))
+
+
+@functools.lru_cache(maxsize=8)
+def _available_port_ranges(low, high, exclude_ranges):
+    """
+    Returns available ports as a sorted list of inclusive ranges.
+    Subtracting ranges directly touches only dozens of tuples instead
+    of hashing ~60k individual port numbers into sets.
+    """
+    exclude = (
         ephemeral.port_ranges()
-        + exclude_ranges
+        + list(exclude_ranges)
         + [SYSTEM_PORT_RANGE, (SYSTEM_PORT_RANGE[1], low), (high, 65536)]
     )
-    return available.difference(exclude)
+    return utils.interval_difference(_UNASSIGNED_RANGES, exclude)
+
+
+@functools.lru_cache(maxsize=8)
+def _available_ports_cached(low, high, exclude_ranges):
+    ranges = _available_port_ranges(low, high, exclude_ranges)
+    return frozenset(utils.ranges_to_set(ranges))
 
 
 def good_port_ranges(ports=None, min_range_len=20, border=3):
@@ -70,23 +171,22 @@ def good_port_ranges(ports=None, min_range_len=20, border=3):
     Ranges borders are also excluded.
     """
     if ports is None:
-        ports = available_ports()
-
-    # Convert ports to sorted list and then to ranges
-    sorted_ports = sorted(list(ports))
-    ranges = list(utils.to_ranges(sorted_ports))
-
-    # Filter ranges by minimum length and apply border exclusion
-    good_ranges = []
-    for r in ranges:
-        range_len = r[1] - r[0] + 1
-        if range_len >= min_range_len:
-            # Apply border exclusion
-            start = r[0] + border
-            end = r[1] - border
-            # Check if range is still large enough after border exclusion
-            if end - start + 1 > min_range_len:  # Changed from >= to >
-                good_ranges.append((start, end))
+        # Consume the available ranges directly instead of
+        # materializing and re-compressing a port set.
+        ranges = _available_port_ranges(1024, 65535, ())
+    else:
+        # Convert ports to sorted list and then to ranges
+        sorted_ports = sorted(list(ports))
+        ranges = list(utils.to_ranges(sorted_ports))
+
+    # Trim borders and keep ranges that are still large enough; the
+    # post-trim length test subsumes the pre-trim one, so a single
+    # comparison per range is enough.  Kept as > (not >=) on purpose.
+    good_ranges = [
+        (lo + border, hi - border)
+        for lo, hi in ranges
+        if (hi - lo + 1) - 2 * border > min_range_len
+    ]
 
     # Sort by range size (descending), then by start position for stability
     good_ranges.sort(key=lambda r: (-(r[1] - r[0]), r[0]))
@@ -94,12 +194,32 @@ def good_port_ranges(ports=None, min_range_len=20, border=3):
     return good_ranges
 
 
+@functools.lru_cache(maxsize=8)
 def available_good_ports(min_range_len=20, border=3):
     """
-    Returns a set of 'good' ports.
+    Returns a frozenset of 'good' ports.
+
+    The result is cached for the process lifetime; call
+    ``available_good_ports.cache_clear()`` to recompute (this drops
+    every cached availability computation, including
+    ``available_ports``).
     """
     good_ranges = good_port_ranges(None, min_range_len, border)
-    return utils.ranges_to_set(good_ranges)
+    return frozenset(utils.ranges_to_set(good_ranges))
+
+
+def _clear_availability_caches():
+    _available_port_ranges.cache_clear()
+    _available_ports_cached.cache_clear()
+    _available_good_ports_lru_clear()
+
+
+# available_good_ports recomputes through the cached range helpers, so
+# a public cache_clear() must drop all three caches or callers would
+# keep getting the stale result back.
+_available_good_ports_lru_clear = available_good_ports.cache_clear
+available_ports.cache_clear = _clear_availability_caches
+available_good_ports.cache_clear = _clear_availability_caches
 
 
 def port_is_used(port, host="127.0.0.1"):
@@ -111,31 +231,100 @@ def port_is_used(port, host="127.0.0.1"):
     if port < SYSTEM_PORT_RANGE[1]:
         return True
 
-    unused = _can_bind(port, host) and _refuses_connection(port, host)
-    return not unused
-
-
-def _can_bind(port, host):
+    # Probe with a connect first: anything that accepts (or swallows)
+    # the connection marks the port used after a single fast syscall.
+    # A refused connection alone doesn't make the port free — it may be
+    # bound without listening — so only that outcome needs the bind
+    # check. The two checks can't share a socket: a bound TCP socket
+    # can't connect to its own address (self-connect).
     sock = socket.socket()
     with contextlib.closing(sock):
-        try:
-            sock.bind((host, port))
-        except socket.error:
-            return False
-    return True
-
+        sock.setblocking(False)
+        err = sock.connect_ex((host, port))
+        if err in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+            select.select([], [sock], [], _CONNECT_TIMEOUT)
+            err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+    if err != errno.ECONNREFUSED:
+        return True
 
-def _refuses_connection(port, host):
+    # Nothing is listening; used only if we can't bind it.
     sock = socket.socket()
-    with contextlib.closing(sock):
-        sock.settimeout(1)
-        err = sock.connect_ex((host, port))
-        return err == errno.ECONNREFUSED
+    try:
+        sock.bind((host, port))
+    except socket.error:
+        return True
+    finally:
+        sock.close()
+    return False
 
 
 def filter_by_type(lst, type_of):
-    """Returns a list of elements with given type."""
-    return [e for e in lst if isinstance(e, type_of)]
+    """Returns an iterator over elements with given type."""
+    if isinstance(type_of, type):
+        # The bound __instancecheck__ lets filter() run the type test
+        # without a Python-level lambda frame per element.
+        return filter(type_of.__instancecheck__, lst)
+    # type_of may also be a tuple of types, as with isinstance().
+    return (e for e in lst if isinstance(e, type_of))
+
+
+def _get_port_exact(ports):
+    # Exact port (single int or string); no availability check.
+    if isinstance(ports, str):
+        try:
+            return int(ports)
+        except ValueError:
+            raise ValueError(f"Invalid port string: {ports}")
+    return ports
+
+
+def _get_port_range(ports):
+    # Tuple (port range).
+    if len(ports) != 2:
+        raise ValueError(f"Invalid ports parameter: {ports}")
+    start, end = ports
+    return select_random(set(range(start, end + 1)))
+
+
+def _get_port_set(ports):
+    # Set (specific ports).
+    return select_random(ports)
+
+
+def _get_port_list(ports):
+    # List (can contain a mix of formats): gather each item as a lazy
+    # iterable (range objects stay unexpanded) and let the set
+    # constructor consume them all in one chained pass.
+    parts = []
+    for item in ports:
+        if isinstance(item, tuple) and len(item) == 2:
+            # Port range
+            start, end = item
+            parts.append(range(start, end + 1))
+        elif isinstance(item, set):
+            # Set of ports
+            parts.append(item)
+        elif isinstance(item, (int, str)):
+            # Single port
+            parts.append((_get_port_exact(item),))
+
+    all_ports = set(chain.from_iterable(parts))
+    if not all_ports:
+        raise ValueError(f"Invalid ports parameter: {ports}")
+    return select_random(all_ports)
+
+
+# One dict lookup on type(ports) replaces the isinstance chain for the
+# (common) exact-type arguments; insertion order doubles as the
+# isinstance fallback order for subclasses.
+_GET_PORT_HANDLERS = {
+    int: _get_port_exact,
+    str: _get_port_exact,
+    tuple: _get_port_range,
+    set: _get_port_set,
+    frozenset: _get_port_set,
+    list: _get_port_list,
+}
 
 
 def get_port(ports):
@@ -161,50 +350,14 @@ def get_port(ports):
     if ports is None:
         return select_random()
 
-    # Handle exact port (single int or string)
-    if isinstance(ports, (int, str)):
-        # Convert string to int if needed
-        if isinstance(ports, str):
-            try:
-                return int(ports)
-            except ValueError:
-                raise ValueError(f"Invalid port string: {ports}")
-        return ports
-
-    # Handle tuple (port range)
-    if isinstance(ports, tuple) and len(ports) == 2:
-        start, end = ports
-        port_set = set(range(start, end + 1))
-        return select_random(port_set)
-
-    # Handle set (specific ports)
-    if isinstance(ports, set):
-        return select_random(ports)
-
-    # Handle list (can contain mix of formats)
-    if isinstance(ports, list):
-        # Collect all possible ports from the list
-        all_ports = set()
-
-        for item in ports:
-            if isinstance(item, tuple) and len(item) == 2:
-                # Port range
-                start, end = item
-                all_ports.update(range(start, end + 1))
-            elif isinstance(item, set):
-                # Set of ports
-                all_ports.update(item)
-            elif isinstance(item, (int, str)):
-                # Single port
-                if isinstance(item, str):
-                    try:
-                        all_ports.add(int(item))
-                    except ValueError:
-                        raise ValueError(f"Invalid port string: {item}")
-                else:
-                    all_ports.add(item)
-
-        if all_ports:
-            return select_random(all_ports)
-
-    raise ValueError(f"Invalid ports parameter: {ports}")
+    handler = _GET_PORT_HANDLERS.get(type(ports))
+    if handler is None:
+        # Subclasses of the supported types still dispatch correctly.
+        for tp, tp_handler in _GET_PORT_HANDLERS.items():
+            if isinstance(ports, tp):
+                handler = tp_handler
+                break
+
+    if handler is None:
+        raise ValueError(f"Invalid ports parameter: {ports}")
+    return handler(ports)
@@ -13,6 +13,7 @@ DEFAULT_CONFIG_PATH = "/etc/port-for.conf"
 class PortStore(object):
     def __init__(self, config_filename=DEFAULT_CONFIG_PATH):
         self._config = config_filename
+        self._parser = None
 
     def bind_port(self, app, port=None):
         if "=" in app or ":" in app:
@@ -33,17 +34,20 @@ class PortStore(object):
             return int(existing_port)
 
         # Get all currently bound ports
-        app_by_port = dict((v, k) for k, v in parser.items(DEFAULTSECT))
-        bound_port_numbers = list(map(int, app_by_port.keys()))
+        bound = parser.items(DEFAULTSECT)
 
         if port is None:
             # Auto-select a port
+            bound_port_numbers = [int(v) for _, v in bound]
             port = str(select_random(exclude_ports=bound_port_numbers))
         else:
-            # Check if requested port is already used by another app
-            if port in app_by_port:
+            # Check if requested port is already used by another app;
+            # the set comprehension runs at C speed and the owning app
+            # is only looked up on the (rare) conflict path.
+            if port in {bound_port for _, bound_port in bound}:
+                owner = next(a for a, p in bound if p == port)
                 raise PortForException("Port %s is already used by app '%s'" % (port,
-                                     app_by_port[port]))
+                                     owner))
 
         # Bind the port
         parser.set(DEFAULTSECT, app, port)
@@ -62,16 +66,26 @@ class PortStore(object):
         return [(app, int(port)) for app, port in items]
 
     def _ensure_config_exists(self):
-        if not os.path.exists(self._config):
-            with open(self._config, "w"):
+        try:
+            os.stat(self._config)
+        except OSError:
+            # Create an empty file; append + binary mode avoids both
+            # truncating a file that appeared meanwhile and setting up
+            # an unused text-encoding layer.
+            with open(self._config, "ab"):
                 pass
 
     def _get_parser(self):
-        self._ensure_config_exists()
-        parser = ConfigParser()
-        parser.read(self._config)
-        return parser
+        # The config is read once and kept in memory; every write goes
+        # through _save, which keeps the cached parser current.
+        if self._parser is None:
+            self._ensure_config_exists()
+            parser = ConfigParser()
+            parser.read(self._config)
+            self._parser = parser
+        return self._parser
 
     def _save(self, parser):
         with open(self._config, "w") as f:
             parser.write(f)
+        self._parser = parser
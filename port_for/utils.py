@@ -15,6 +15,33 @@ def ranges_to_set(lst):
     return set(itertools.chain(*(range(x[0], x[1] + 1) for x in lst)))
 
 
+def interval_difference(a_ranges, b_ranges):
+    """
+    Subtract one list of inclusive ranges from another, without
+    expanding the ranges into individual numbers::
+
+    >>> interval_difference([(1, 10), (15, 20)], [(4, 6), (18, 30)])
+    [(1, 3), (7, 10), (15, 17)]
+
+    """
+    b_ranges = sorted(r for r in b_ranges if r[0] <= r[1])
+    result = []
+    for lo, hi in sorted(a_ranges):
+        for b_lo, b_hi in b_ranges:
+            if b_hi < lo:
+                continue
+            if b_lo > hi:
+                break
+            if b_lo > lo:
+                result.append((lo, b_lo - 1))
+            lo = b_hi + 1
+            if lo > hi:
+                break
+        if lo <= hi:
+            result.append((lo, hi))
+    return result
+
+
 def to_ranges(lst):
     """
     Convert a list of numbers to a list of ranges::
@@ -24,6 +51,14 @@ def to_ranges(lst):
     [(1, 3), (5, 6)]
 
     """
-    for a, b in itertools.groupby(enumerate(lst), lambda t: t[1] - t[0]):
-        b = list(b)
-        yield b[0][1], b[-1][1]
+    it = iter(lst)
+    try:
+        start = prev = next(it)
+    except StopIteration:
+        return
+    for num in it:
+        if num != prev + 1:
+            yield start, prev
+            start = num
+        prev = num
+    yield start, prev